@@ -0,0 +1,176 @@
+from datetime import datetime, timezone
+import threading
+import time
+from pymongo import collection
+from pymongo.errors import OperationFailure
+from proj import (get_database, analyze_tech_stack_preference, analyze_mental_health_impact, analyze_remote_work_impact,
+                  employed_vs_unemployed_gap, job_title_and_common_lang_used)
+
+#Keeps cached analysis results current by following a change stream on surveyresult.
+#Change streams need a replica set, for a local test start a single node one:
+#   mongod --replSet rs0 --dbpath <dir>    then in mongosh: rs.initiate()
+#and point CONNECTION_STRING at mongodb://localhost:27017/?replicaSet=rs0
+
+ANALYSES = {
+    "analyze_tech_stack_preference": analyze_tech_stack_preference,
+    "analyze_mental_health_impact": analyze_mental_health_impact,
+    "employed_vs_unemployed_gap": employed_vs_unemployed_gap,
+    "analyze_remote_work_impact": analyze_remote_work_impact,
+    "job_title_and_common_lang_used": job_title_and_common_lang_used
+}
+
+#Top level fields every pipeline reads, an update that touches none of them leaves the result unchanged
+ANALYSIS_FIELDS = {
+    "analyze_tech_stack_preference": {"LanguageHaveWorkedWith", "WebframeHaveWorkedWith", "Country", "CompTotal", "CompFreq", "OrgSize"},
+    "analyze_mental_health_impact": {"MentalHealth", "Gender", "Ethnicity", "CodingActivities", "PurchaseInfluence"},
+    "employed_vs_unemployed_gap": {"MainBranch", "LearnCode", "Employment", "OrgSize", "EdLevel", "Country", "LanguageHaveWorkedWith"},
+    "analyze_remote_work_impact": {"MainBranch", "Employment", "RemoteWork", "YearsCodePro", "ConvertedCompYearly", "Age"},
+    "job_title_and_common_lang_used": {"DevType", "LanguageHaveWorkedWith", "YearsCodePro", "ConvertedCompYearly", "Employment"}
+}
+
+#_id of the document that holds the change stream resume token next to the materialized results
+RESUME_TOKEN_ID = "_resume_token"
+
+#Events after which the stream is invalidated and cannot be followed any further
+STREAM_END_EVENTS = ["drop", "rename", "dropDatabase", "invalidate"]
+
+#Server error code (ChangeStreamHistoryLost) when the oplog no longer holds the resume token
+CHANGE_STREAM_HISTORY_LOST = 286
+
+def changed_fields(change: dict):
+
+    #Top level fields of an update event, None when the whole document changed (insert, replace, delete)
+    if change["operationType"] != "update":
+        return None
+    description = change.get("updateDescription", {})
+    paths = list(description.get("updatedFields", {})) + description.get("removedFields", [])
+    paths += [truncated["field"] for truncated in description.get("truncatedArrays", [])]
+    return {path.split(".")[0] for path in paths}
+
+def affected_analyses(change: dict):
+
+    fields = changed_fields(change)
+    if fields is None:
+        return set(ANALYSES)
+    return {name for name, reads in ANALYSIS_FIELDS.items() if reads & fields}
+
+def refresh_analyses(data: collection.Collection, names: set, cache: dict, materialize: collection.Collection = None):
+
+    #Re-run the given analyses, keep the results in cache and optionally upsert them into a results collection
+    data_count = data.estimated_document_count()
+    for name in sorted(names):
+        result = ANALYSES[name](data, data_count)
+        result = result if isinstance(result, dict) else list(result)
+        refreshed_at = datetime.now(timezone.utc)
+        cache[name] = {"result": result, "refreshedAt": refreshed_at}
+        if materialize is not None:
+            materialize.replace_one({"_id": name}, {"_id": name, "result": result, "refreshedAt": refreshed_at}, upsert=True)
+    return cache
+
+def load_materialized(materialize: collection.Collection, cache: dict):
+
+    #Results and the resume token a previous watcher left in the results collection.
+    #Without a token the results cannot be told from stale ones (e.g. after a drop) and are not loaded
+    resume_token, results = None, {}
+    for doc in materialize.find({}):
+        if doc["_id"] == RESUME_TOKEN_ID:
+            resume_token = doc["token"]
+        elif doc["_id"] in ANALYSES:
+            results[doc["_id"]] = {"result": doc["result"], "refreshedAt": doc["refreshedAt"]}
+    if resume_token is not None:
+        for name, result in results.items():
+            cache.setdefault(name, result)
+    return resume_token
+
+def save_resume_token(materialize: collection.Collection, resume_token):
+
+    if resume_token is None:
+        materialize.delete_one({"_id": RESUME_TOKEN_ID})
+    else:
+        materialize.replace_one({"_id": RESUME_TOKEN_ID}, {"_id": RESUME_TOKEN_ID, "token": resume_token}, upsert=True)
+
+def watch_survey_changes(data: collection.Collection, cache: dict, debounce: float = 2.0, max_delay: float = 10.0,
+                         materialize: collection.Collection = None, on_refresh=None, stop: threading.Event = None):
+
+    #Changes are collected until the stream is quiet for debounce seconds, or max_delay after the first one,
+    #then only the analyses that read a changed field are refreshed
+    stop = stop or threading.Event()
+
+    #The resume token is only saved once the changes before it are refreshed, so a restart replays the rest
+    resume_token = load_materialized(materialize, cache) if materialize is not None else None
+    saved_token, saved_at = resume_token, time.monotonic()
+
+    def flush(names, token):
+        nonlocal saved_token, saved_at
+        if names:
+            refresh_analyses(data, names, cache, materialize)
+            if on_refresh is not None:
+                on_refresh(names, cache)
+        if materialize is not None and token != saved_token:
+            save_resume_token(materialize, token)
+            saved_token, saved_at = token, time.monotonic()
+
+    #Without a resume token whatever is cached may be stale, so every analysis is refreshed
+    names = set(ANALYSES) if resume_token is None else set(ANALYSES) - set(cache)
+    while True:
+        try:
+            #Polling at half the debounce notices a quiet stream in time
+            with data.watch(resume_after=resume_token, max_await_time_ms=max(int(debounce * 500), 1)) as stream:
+
+                #The stream is opened first so no change made during the initial run is missed
+                flush(names, stream.resume_token)
+
+                pending, first_change, last_change, ended = set(), None, None, None
+                while stream.alive and not stop.is_set():
+                    change = stream.try_next()
+                    now = time.monotonic()
+                    if change is not None:
+                        if change["operationType"] in STREAM_END_EVENTS:
+                            ended = change["operationType"]
+                            break
+                        affected = affected_analyses(change)
+                        if affected:
+                            pending |= affected
+                            first_change = first_change or now
+                            last_change = now
+
+                    if pending and (now - last_change >= debounce or now - first_change >= max_delay):
+                        flush(pending, stream.resume_token)
+                        pending, first_change, last_change = set(), None, None
+                    elif not pending and now - saved_at >= max_delay:
+                        #A quiet stream still advances its token, it is saved at most once every max_delay
+                        flush(set(), stream.resume_token)
+
+                #Whatever was still waiting for the debounce is refreshed before returning or raising
+                if ended is None:
+                    flush(pending, stream.resume_token)
+                else:
+                    #The collection is gone or renamed, the stream cannot be resumed past this event
+                    flush(pending, None)
+                    raise RuntimeError("Change stream on %s ended with a %s event" % (data.full_name, ended))
+            break
+        except OperationFailure as error:
+            if error.code != CHANGE_STREAM_HISTORY_LOST or resume_token is None:
+                raise
+            #The oplog no longer reaches back to the token, the changes since then are unknown,
+            #so the stream starts over from now and every analysis is refreshed
+            flush(set(), None)
+            resume_token, names = None, set(ANALYSES)
+
+    if not stop.is_set():
+        raise RuntimeError("Change stream on %s was closed by the server" % data.full_name)
+    return cache
+
+if __name__ == "__main__":
+
+    #Get the database
+    stack_db = get_database()
+
+    def print_refresh(names, cache):
+        for name in sorted(names):
+            print(cache[name]["refreshedAt"].isoformat(), "refreshed", name)
+
+    try:
+        watch_survey_changes(stack_db["surveyresult"], {}, materialize=stack_db["analysisresults"], on_refresh=print_refresh)
+    except KeyboardInterrupt:
+        pass
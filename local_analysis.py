@@ -0,0 +1,554 @@
+from multiprocessing import Pool, shared_memory
+from os import cpu_count
+import operator
+import re
+import time
+import numpy as np
+from prettytable import PrettyTable
+from pymongo import collection
+from proj import get_database, decode_language_mask, count_language_mask
+
+#Offline versions of the analyze_* pipelines that run over a columnar copy of surveyresult.
+#Respondents are cut into fixed shards, every shard yields a partial group state and the states are
+#merged in shard order, so the result is identical whether the shards ran serially or in a process pool.
+
+CATEGORICAL_FIELDS = ["MainBranch", "Employment", "RemoteWork", "EdLevel", "Country", "OrgSize", "Age",
+                      "LearnCode", "MentalHealth", "CompFreq", "Gender", "Ethnicity", "CodingActivities",
+                      "PurchaseInfluence", "LanguageHaveWorkedWith", "WebframeHaveWorkedWith", "DevType"]
+MULTI_VALUED_FIELDS = ["Gender", "Ethnicity", "CodingActivities", "PurchaseInfluence",
+                       "LanguageHaveWorkedWith", "WebframeHaveWorkedWith", "DevType"]
+NUMERIC_FIELDS = ["ConvertedCompYearly", "YearsCodePro", "CompTotal"]
+
+TOP_COUNTRIES = ["United States of America", "India", "Canada", "Australia", "United Kingdom of Great Britain and Northern Ireland"]
+DEVELOPER_BRANCHES = ["I am a developer by profession", "I used to be a developer by profession, but no longer am"]
+AGE_GROUPS = ["Under 25", "25-35", "35-45", "45-55", "55+"]
+ORG_SIZE_BUCKETS = ["Small", "Medium", "Large", "Very Large", "Unknown"]
+UNDISCLOSED = re.compile("^(?!.*(?:Or, in your own words:|Prefer not to say)).*$")
+SELF_TAUGHT = re.compile("^(?!.*(?:Coding Bootcamp|School|Online Courses or Certification)).*$")
+
+#Upper bound on the rows of one shard, there are always at least max_workers shards so that every worker gets one
+SHARD_SIZE = 8192
+
+REDUCERS = {"sum": operator.add, "max": max, "or": operator.or_}
+
+def load_survey_columns(data: collection.Collection):
+
+    #Categorical fields become int32 codes into a per-field vocabulary, -1 marks a missing field
+    projection = {field: 1 for field in CATEGORICAL_FIELDS + NUMERIC_FIELDS}
+    projection["_id"] = 0
+    codes = {field: {} for field in CATEGORICAL_FIELDS}
+    columns = {field: [] for field in CATEGORICAL_FIELDS}
+    for field in NUMERIC_FIELDS:
+        columns[field] = []
+        columns[field + "Present"] = []
+
+    for doc in data.find({}, projection):
+        for field in CATEGORICAL_FIELDS:
+            value = doc.get(field)
+            columns[field].append(-1 if value is None else codes[field].setdefault(value, len(codes[field])))
+        for field in NUMERIC_FIELDS:
+            #$avg skips strings such as "Less than 1 year" while the $ne "NA" filters still keep them
+            value = doc.get(field)
+            columns[field + "Present"].append(value is not None and value != "NA")
+            columns[field].append(float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else np.nan)
+
+    for field in CATEGORICAL_FIELDS:
+        columns[field] = np.array(columns[field], dtype=np.int32)
+    for field in NUMERIC_FIELDS:
+        columns[field] = np.array(columns[field], dtype=np.float64)
+        columns[field + "Present"] = np.array(columns[field + "Present"], dtype=bool)
+
+    vocab = {field: list(codes[field]) for field in CATEGORICAL_FIELDS}
+    return columns, vocab
+
+def age_group(age):
+
+    #A missing match compares below every number, as in the $switch of analyze_remote_work_impact
+    digits = re.search(r"\d+", age) if isinstance(age, str) else None
+    if digits is None:
+        return 0
+    age = int(digits.group())
+    for group, bound in enumerate([24, 34, 44]):
+        if age <= bound:
+            return group
+    return 3 if age <= 54 else 4
+
+def org_size_bucket(org_size):
+
+    #BSON orders null before numbers and strings after them, which the $switch of analyze_tech_stack_preference inherits
+    if org_size is None:
+        return 0
+    if isinstance(org_size, str):
+        return 3
+    for bucket, bound in enumerate([10, 100, 1000]):
+        if org_size <= bound:
+            return bucket
+    return 3 if org_size >= 10000 else 4
+
+def build_lookups(vocab: dict):
+
+    #Every table has one extra last row for a missing field, so a code of -1 indexes it directly
+    lookups = {"vocab": vocab, "codes": {}, "given": {}, "items": {}, "item_index": {}, "split": {}, "sizes": {}, "masks": {}}
+    for field, values in vocab.items():
+        lookups["codes"][field] = {value: code for code, value in enumerate(values)}
+        lookups["given"][field] = np.array([value != "NA" for value in values] + [False])
+
+    for field in MULTI_VALUED_FIELDS:
+        parts = [str(value).split(";") for value in vocab[field]]
+        items = sorted({part for value, p in zip(vocab[field], parts) if value != "NA" for part in p})
+        index = {item: i for i, item in enumerate(items)}
+
+        #split[field][item] counts how often item occurs in each raw value, i.e. the rows $unwind would emit
+        split = np.zeros((len(items), len(parts) + 1), dtype=np.uint8)
+        masks = []
+        for code, p in enumerate(parts):
+            mask = 0
+            for part in p:
+                if part in index:
+                    split[index[part], code] += 1
+                    mask |= 1 << index[part]
+            masks.append(mask)
+
+        lookups["items"][field] = items
+        lookups["item_index"][field] = index
+        lookups["split"][field] = split
+        lookups["sizes"][field] = np.array([len(p) for p in parts] + [0], dtype=np.int64)
+        lookups["masks"][field] = masks + [0]
+
+    lookups["disclosed"] = {
+        field: np.array([isinstance(value, str) and value != "NA" and UNDISCLOSED.match(value) is not None for value in vocab[field]] + [False])
+        for field in ["Gender", "Ethnicity"]
+    }
+    lookups["self_taught"] = np.array([isinstance(value, str) and value != "NA" and SELF_TAUGHT.match(value) is not None for value in vocab["LearnCode"]] + [False])
+    lookups["age_group"] = np.array([age_group(value) for value in vocab["Age"]] + [age_group(None)], dtype=np.int64)
+    lookups["org_size_bucket"] = np.array([org_size_bucket(value) for value in vocab["OrgSize"]] + [org_size_bucket(None)], dtype=np.int64)
+
+    return lookups
+
+def _code(lookups: dict, field: str, value):
+
+    #-2 never occurs in a column, so a value that was not loaded selects no rows
+    return lookups["codes"][field].get(value, -2)
+
+def _label(lookups: dict, field: str, code: int):
+
+    return None if code < 0 else lookups["vocab"][field][code]
+
+def _member(lookups: dict, columns: dict, field: str, item: int):
+
+    return lookups["split"][field][item][columns[field]].astype(np.int64)
+
+def _group(rows, keys: list, weight, values: list = ()):
+
+    #Weighted $group over the selected rows, returns the distinct keys, the row -> group index and per group sums
+    if not rows.any():
+        return [], np.empty(0, dtype=np.int64), []
+    weight = weight[rows]
+    groups, inverse = np.unique(np.stack([key[rows] for key in keys], axis=1), axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    sums = [np.bincount(inverse, weights=weight, minlength=len(groups))]
+    for value in values:
+        value = value[rows]
+        valid = ~np.isnan(value)
+        sums.append(np.bincount(inverse, weights=np.where(valid, value, 0.0) * weight, minlength=len(groups)))
+        sums.append(np.bincount(inverse, weights=valid * weight, minlength=len(groups)))
+    return [tuple(int(k) for k in group) for group in groups], inverse, sums
+
+def _avg(total: float, count: int):
+
+    return total / count if count else None
+
+def merge_states(state: dict, partial: dict, reducers: tuple):
+
+    for key, slots in partial.items():
+        if key in state:
+            state[key] = [REDUCERS[reducer](a, b) for reducer, a, b in zip(reducers, state[key], slots)]
+        else:
+            state[key] = list(slots)
+    return state
+
+def _mental_health_partial(columns: dict, lookups: dict):
+
+    rows = (lookups["given"]["MentalHealth"][columns["MentalHealth"]]
+            & lookups["disclosed"]["Gender"][columns["Gender"]]
+            & lookups["disclosed"]["Ethnicity"][columns["Ethnicity"]])
+    coding = lookups["sizes"]["CodingActivities"][columns["CodingActivities"]]
+    influence = lookups["item_index"]["PurchaseInfluence"].get("I have a great deal of influence")
+    active = coding > 2
+    if influence is None:
+        active = np.zeros_like(active)
+    else:
+        active &= _member(lookups, columns, "PurchaseInfluence", influence) > 0
+    healthy = columns["MentalHealth"] == _code(lookups, "MentalHealth", "None of the above")
+
+    state = {}
+    for gender in range(len(lookups["items"]["Gender"])):
+        gender_weight = rows * _member(lookups, columns, "Gender", gender)
+        if not gender_weight.any():
+            continue
+        for ethnicity in range(len(lookups["items"]["Ethnicity"])):
+            weight = gender_weight * _member(lookups, columns, "Ethnicity", ethnicity)
+            if not weight.any():
+                continue
+            state[(gender, ethnicity)] = [
+                int(weight.sum()),
+                int(coding[weight > 0].max()),
+                int((weight * (active & ~healthy)).sum()),
+                int((weight * (active & healthy)).sum())
+            ]
+    return state
+
+def _mental_health_finalize(state: dict, lookups: dict):
+
+    result = []
+    for (gender, ethnicity), (total, coding, issues, likely) in sorted(state.items()):
+        result.append({
+            "total_respondents": total,
+            "coding_activities_count": coding,
+            "percentage_mental_health_issues": issues / total * 100,
+            "percentage_likely_mental_health_issues": likely / total * 100,
+            "Gender": lookups["items"]["Gender"][gender],
+            "Ethnicity": lookups["items"]["Ethnicity"][ethnicity]
+        })
+    result.sort(key=lambda doc: -doc["percentage_likely_mental_health_issues"])
+    return result[:5]
+
+def _tech_stack_partial(columns: dict, lookups: dict):
+
+    rows = (lookups["given"]["LanguageHaveWorkedWith"][columns["LanguageHaveWorkedWith"]]
+            & np.isin(columns["Country"], [_code(lookups, "Country", country) for country in TOP_COUNTRIES])
+            & lookups["given"]["WebframeHaveWorkedWith"][columns["WebframeHaveWorkedWith"]]
+            & columns["CompTotalPresent"]
+            & (columns["CompFreq"] == _code(lookups, "CompFreq", "Yearly")))
+    bucket = lookups["org_size_bucket"][columns["OrgSize"]]
+
+    state = {}
+    for language in range(len(lookups["items"]["LanguageHaveWorkedWith"])):
+        language_weight = rows * _member(lookups, columns, "LanguageHaveWorkedWith", language)
+        selected = np.nonzero(language_weight)[0]
+        if not len(selected):
+            continue
+        webframes = columns["WebframeHaveWorkedWith"][selected]
+        for webframe in range(len(lookups["items"]["WebframeHaveWorkedWith"])):
+            weight = language_weight[selected] * lookups["split"]["WebframeHaveWorkedWith"][webframe][webframes]
+            keys, _, sums = _group(weight > 0, [columns["Country"][selected], bucket[selected]], weight, [columns["CompTotal"][selected]])
+            for i, (country, org_size) in enumerate(keys):
+                state[(country, language, webframe, org_size)] = [int(sums[0][i]), float(sums[1][i]), int(sums[2][i])]
+    return state
+
+def _tech_stack_finalize(state: dict, lookups: dict):
+
+    stacks = {}
+    for (country, language, webframe, org_size), (count, comp_total, comp_count) in sorted(state.items()):
+        stack = lookups["items"]["LanguageHaveWorkedWith"][language] + ";" + lookups["items"]["WebframeHaveWorkedWith"][webframe]
+        stacks.setdefault((country, org_size), []).append({
+            "TechnologyStack": stack,
+            "Count": count,
+            "CompTotal": _avg(comp_total, comp_count),
+            "CompFreq": "Yearly"
+        })
+
+    result = []
+    for (country, org_size), technology_stacks in stacks.items():
+        technology_stacks.sort(key=lambda stack: stack["TechnologyStack"])
+        dominant = {"TechnologyStack": "", "Count": 0}
+        for stack in technology_stacks:
+            if stack["Count"] > dominant["Count"]:
+                dominant = stack
+        result.append({
+            "Country": _label(lookups, "Country", country),
+            "OrgSize": ORG_SIZE_BUCKETS[org_size],
+            "DominantStack": dominant,
+            "LeastDominantStack": technology_stacks[-1],
+            "TotalDevelopers": sum(stack["Count"] for stack in technology_stacks)
+        })
+    result.sort(key=lambda doc: -doc["TotalDevelopers"])
+    return result[:5]
+
+def _remote_work_partial(columns: dict, lookups: dict):
+
+    rows = ((columns["MainBranch"] == _code(lookups, "MainBranch", "I am a developer by profession"))
+            & (columns["Employment"] == _code(lookups, "Employment", "Employed, full-time"))
+            & np.isin(columns["RemoteWork"], [_code(lookups, "RemoteWork", "Fully remote"), _code(lookups, "RemoteWork", "Hybrid (some remote, some in-person)")])
+            & columns["YearsCodeProPresent"]
+            & columns["ConvertedCompYearlyPresent"])
+    age = lookups["age_group"][columns["Age"]]
+
+    keys, _, sums = _group(rows, [age, columns["RemoteWork"]], np.ones(len(rows), dtype=np.int64), [columns["ConvertedCompYearly"], columns["YearsCodePro"]])
+    state = {}
+    for i, key in enumerate(keys):
+        count, comp_total, comp_count, exp_total, exp_count = (s[i] for s in sums)
+        state[key] = [int(count), float(comp_total), int(comp_count), float(exp_total), int(exp_count)]
+    return state
+
+def _remote_work_finalize(state: dict, lookups: dict):
+
+    result = []
+    for (age, remote_work), (count, comp_total, comp_count, exp_total, exp_count) in state.items():
+        result.append({
+            "AvgCompensation": _avg(comp_total, comp_count),
+            "AvgYearsExp": _avg(exp_total, exp_count),
+            "Count": count,
+            "Age": AGE_GROUPS[age],
+            "RemoteWork": _label(lookups, "RemoteWork", remote_work)
+        })
+    result.sort(key=lambda doc: (doc["Age"], doc["RemoteWork"]))
+    return result
+
+EMPLOYED_GROUP_FIELDS = ["Employment", "OrgSize", "EdLevel", "Country"]
+UNEMPLOYED_GROUP_FIELDS = ["EdLevel", "Country"]
+
+def _employed_gap_partial(columns: dict, lookups: dict):
+
+    languages = columns["LanguageHaveWorkedWith"]
+    rows = (np.isin(columns["MainBranch"], [_code(lookups, "MainBranch", branch) for branch in DEVELOPER_BRANCHES])
+            & lookups["self_taught"][columns["LearnCode"]]
+            & lookups["given"]["LanguageHaveWorkedWith"][languages])
+    size = lookups["sizes"]["LanguageHaveWorkedWith"][languages]
+    masks = lookups["masks"]["LanguageHaveWorkedWith"]
+
+    state = {}
+    facets = [
+        ("employedDevelopers", rows & (columns["Employment"] == _code(lookups, "Employment", "Employed, full-time")), EMPLOYED_GROUP_FIELDS),
+        ("unemployedDevelopers", rows & (columns["Employment"] == _code(lookups, "Employment", "Not employed, but looking for work")), UNEMPLOYED_GROUP_FIELDS)
+    ]
+    for facet, facet_rows, fields in facets:
+        keys, inverse, sums = _group(facet_rows, [columns[field] for field in fields], size)
+        if not keys:
+            continue
+
+        #OR the mask of every distinct raw language string once per group
+        group_masks = [0] * len(keys)
+        for group, code in np.unique(np.stack([inverse, languages[facet_rows]], axis=1), axis=0):
+            group_masks[group] |= masks[code]
+        for i, key in enumerate(keys):
+            state[(facet,) + key] = [int(sums[0][i]), group_masks[i]]
+    return state
+
+def _employed_gap_finalize(state: dict, lookups: dict):
+
+    vocabulary = lookups["items"]["LanguageHaveWorkedWith"]
+    gap = {"employedDevelopers": [], "unemployedDevelopers": []}
+    union = {"employedDevelopers": 0, "unemployedDevelopers": 0}
+    for key, (count, mask) in sorted(state.items()):
+        facet = key[0]
+        fields = EMPLOYED_GROUP_FIELDS if facet == "employedDevelopers" else UNEMPLOYED_GROUP_FIELDS
+        developer = {field: _label(lookups, field, code) for field, code in zip(fields, key[1:])}
+        developer["Count"] = count
+        developer["LanguageMask"] = mask
+        developer["LanguageHaveWorkedWith"] = decode_language_mask(mask, vocabulary)
+        gap[facet].append(developer)
+
+    for facet in union:
+        gap[facet].sort(key=lambda developer: -developer["Count"])
+        gap[facet] = gap[facet][:5]
+        for developer in gap[facet]:
+            union[facet] |= developer["LanguageMask"]
+
+    skills_lack = union["employedDevelopers"] & ~union["unemployedDevelopers"]
+    gap["unemployedSkillsLack"] = decode_language_mask(skills_lack, vocabulary)
+    gap["unemployedSkillsLackCount"] = count_language_mask(skills_lack)
+    return gap
+
+def _job_title_partial(columns: dict, lookups: dict):
+
+    rows = (lookups["given"]["DevType"][columns["DevType"]]
+            & lookups["given"]["LanguageHaveWorkedWith"][columns["LanguageHaveWorkedWith"]]
+            & columns["YearsCodeProPresent"]
+            & columns["ConvertedCompYearlyPresent"]
+            & (columns["Employment"] == _code(lookups, "Employment", "Employed, full-time")))
+    exp, comp = columns["YearsCodePro"], columns["ConvertedCompYearly"]
+
+    state = {}
+    for dev_type in range(len(lookups["items"]["DevType"])):
+        dev_type_weight = rows * _member(lookups, columns, "DevType", dev_type)
+        selected = np.nonzero(dev_type_weight)[0]
+        if not len(selected):
+            continue
+        languages = columns["LanguageHaveWorkedWith"][selected]
+        exp_valid, comp_valid = ~np.isnan(exp[selected]), ~np.isnan(comp[selected])
+        exp_values, comp_values = np.where(exp_valid, exp[selected], 0.0), np.where(comp_valid, comp[selected], 0.0)
+        for language in range(len(lookups["items"]["LanguageHaveWorkedWith"])):
+            weight = dev_type_weight[selected] * lookups["split"]["LanguageHaveWorkedWith"][language][languages]
+            if not weight.any():
+                continue
+            state[(dev_type, language)] = [
+                int(weight.sum()),
+                float((exp_values * weight).sum()), int((exp_valid * weight).sum()),
+                float((comp_values * weight).sum()), int((comp_valid * weight).sum())
+            ]
+    return state
+
+def _job_title_finalize(state: dict, lookups: dict):
+
+    job_titles = {}
+    for (dev_type, language), (count, exp_total, exp_count, comp_total, comp_count) in sorted(state.items()):
+        job_titles.setdefault(dev_type, []).append((count, language, _avg(exp_total, exp_count), _avg(comp_total, comp_count)))
+
+    result = []
+    for dev_type, languages in job_titles.items():
+        languages.sort(key=lambda language: -language[0])
+        exps = [exp for _, _, exp, _ in languages if exp is not None]
+        comps = [comp for _, _, _, comp in languages if comp is not None]
+        result.append({
+            "YearsOfExp": sum(exps) / len(exps) if exps else None,
+            "Compensation": sum(comps) / len(comps) if comps else None,
+            "JobTitle": lookups["items"]["DevType"][dev_type],
+            "TopLanguages": [{"Language": lookups["items"]["LanguageHaveWorkedWith"][language], "count": count} for count, language, _, _ in languages[:5]]
+        })
+    return result
+
+#name -> (partial over one shard, reducer per state slot, finalize into the pipeline's output)
+LOCAL_ANALYSES = {
+    "analyze_mental_health_impact": (_mental_health_partial, ("sum", "max", "sum", "sum"), _mental_health_finalize),
+    "analyze_tech_stack_preference": (_tech_stack_partial, ("sum", "sum", "sum"), _tech_stack_finalize),
+    "employed_vs_unemployed_gap": (_employed_gap_partial, ("sum", "or"), _employed_gap_finalize),
+    "analyze_remote_work_impact": (_remote_work_partial, ("sum", "sum", "sum", "sum", "sum"), _remote_work_finalize),
+    "job_title_and_common_lang_used": (_job_title_partial, ("sum", "sum", "sum", "sum", "sum"), _job_title_finalize)
+}
+
+def share_columns(columns: dict):
+
+    #Lay every column out back to back in one shared memory block, 8 byte aligned
+    layout, offset = {}, 0
+    for field, column in columns.items():
+        layout[field] = (column.dtype.str, offset, len(column))
+        offset += column.nbytes
+        offset += -offset % 8
+
+    shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+    for field, column in columns.items():
+        dtype, start, length = layout[field]
+        np.ndarray(length, dtype=dtype, buffer=shm.buf, offset=start)[:] = column
+    return shm, layout
+
+_worker = {}
+
+def _attach_shared_columns(name: str, layout: dict, lookups: dict):
+
+    shm = shared_memory.SharedMemory(name=name)
+    _worker["shm"] = shm
+    _worker["columns"] = {field: np.ndarray(length, dtype=dtype, buffer=shm.buf, offset=offset) for field, (dtype, offset, length) in layout.items()}
+    _worker["lookups"] = lookups
+
+def _slice_columns(columns: dict, start: int, stop: int):
+
+    return {field: column[start:stop] for field, column in columns.items()}
+
+def _run_shard(task: tuple):
+
+    analysis, start, stop = task
+    return LOCAL_ANALYSES[analysis][0](_slice_columns(_worker["columns"], start, stop), _worker["lookups"])
+
+def shard_bounds(size: int, shard_size: int, max_workers: int):
+
+    #The shards only depend on the row count, shard_size and max_workers, never on workers, which keeps every merge order the same
+    count = max(-(-size // shard_size), min(max_workers, size), 1)
+    return [(i * size // count, (i + 1) * size // count) for i in range(count)]
+
+class LocalExecutor:
+
+    #Keeps one shared memory copy of the columns and one process pool alive across runs, use it as a context manager:
+    #   with LocalExecutor(columns, lookups, workers=8) as executor:
+    #       results = executor.run()
+    #max_workers is the largest pool the results are compared across, it fixes the shards for every workers <= max_workers
+    def __init__(self, columns: dict, lookups: dict, workers: int = 1, shard_size: int = SHARD_SIZE, max_workers: int = None):
+        self.columns = columns
+        self.lookups = lookups
+        self.workers = cpu_count() if workers is None else workers
+        self.max_workers = max(cpu_count(), self.workers) if max_workers is None else max_workers
+        self.shards = shard_bounds(len(columns["Country"]), shard_size, self.max_workers)
+        self.shm = None
+        self.pool = None
+
+    def __enter__(self):
+        if self.workers > 1:
+            self.shm, layout = share_columns(self.columns)
+            self.pool = Pool(self.workers, initializer=_attach_shared_columns, initargs=(self.shm.name, layout, self.lookups))
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def run(self, analyses: list = None):
+
+        if analyses is None:
+            analyses = list(LOCAL_ANALYSES)
+
+        tasks = [(analysis, start, stop) for analysis in analyses for start, stop in self.shards]
+
+        if self.pool is None:
+            partials = [LOCAL_ANALYSES[analysis][0](_slice_columns(self.columns, start, stop), self.lookups) for analysis, start, stop in tasks]
+        else:
+            partials = self.pool.map(_run_shard, tasks, chunksize=1)
+
+        results = {}
+        for analysis in analyses:
+            _, reducers, finalize = LOCAL_ANALYSES[analysis]
+            state = {}
+            for task, partial in zip(tasks, partials):
+                if task[0] == analysis:
+                    merge_states(state, partial, reducers)
+            results[analysis] = finalize(state, self.lookups)
+        return results
+
+def run_local_analyses(columns: dict, lookups: dict, analyses: list = None, workers: int = 1, shard_size: int = SHARD_SIZE, max_workers: int = None):
+
+    #One-off run, repeated runs should keep a LocalExecutor open instead of paying the pool and copy setup each time
+    with LocalExecutor(columns, lookups, workers, shard_size, max_workers) as executor:
+        return executor.run(analyses)
+
+def benchmark_local_analyses(columns: dict, lookups: dict, worker_counts: list = None, repeat: int = 3):
+
+    if worker_counts is None:
+        worker_counts = sorted({1, 2, 4, 8, cpu_count()})
+
+    #Every run uses the shards of the largest worker count, so all of them can be compared with the serial one
+    max_workers = max(worker_counts)
+    shards = len(shard_bounds(len(columns["Country"]), SHARD_SIZE, max_workers))
+
+    def timed(workers):
+        #Pool start-up and the shared memory copy happen before the clock starts, a warm-up run attaches every worker
+        with LocalExecutor(columns, lookups, workers, max_workers=max_workers) as executor:
+            result = executor.run()
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                executor.run()
+                timings.append(time.perf_counter() - start)
+        return result, min(timings)
+
+    serial, serial_time = timed(1)
+
+    table = PrettyTable()
+    table.field_names = ["Workers", "Seconds", "Speedup"]
+    for workers in worker_counts:
+        result, seconds = (serial, serial_time) if workers == 1 else timed(workers)
+        if result != serial:
+            raise RuntimeError("Local analyses with %d workers differ from the serial path" % workers)
+        table.add_row([workers, round(seconds, 3), round(serial_time / seconds, 2)])
+
+    print("Shards per analysis => ", shards, "\n")
+    print(table)
+    return table
+
+if __name__ == "__main__":
+
+    #Get the collection
+    stack_data = get_database()["surveyresult"]
+
+    columns, vocab = load_survey_columns(stack_data)
+    lookups = build_lookups(vocab)
+    print("Respondents => ", len(columns["Country"]), "\n")
+
+    benchmark_local_analyses(columns, lookups)
@@ -348,7 +348,93 @@ def analyze_remote_work_impact(data: collection.Collection, data_count: int):
     )
     return result
 
-def employed_vs_unemployed_gap(data: collection.Collection, data_count: int):
+#Language vocabularies by collection, building one scans every respondent so it is done once per collection
+_language_vocabularies = {}
+
+def get_language_vocabulary(data: collection.Collection, refresh: bool = False):
+
+    #Every distinct language in LanguageHaveWorkedWith, its position is the bit it owns in a language mask
+    if not refresh and data.full_name in _language_vocabularies:
+        return _language_vocabularies[data.full_name]
+
+    result = data.aggregate(
+        [
+            {
+                "$match": { "LanguageHaveWorkedWith": { "$exists": True, "$ne": "NA" } }
+            },
+            {
+                "$project": {
+                    "_id": 0,
+                    "Languages": { "$split": ["$LanguageHaveWorkedWith", ";"] }
+                }
+            },
+            {
+                "$unwind": "$Languages"
+            },
+            {
+                "$group": { "_id": "$Languages" }
+            },
+            {
+                "$sort": { "_id": 1 }
+            }
+        ]
+    )
+    vocabulary = [doc["_id"] for doc in result]
+
+    #Masks are stored as 64-bit signed longs by mongo
+    if len(vocabulary) > 63:
+        raise ValueError("Language vocabulary has %d entries, at most 63 fit in a mask" % len(vocabulary))
+
+    _language_vocabularies[data.full_name] = vocabulary
+    return vocabulary
+
+def language_mask_expression(vocabulary: list):
+
+    #Turns the $Languages array of a document into the sum of 2^index over the vocabulary, i.e. its bitmask
+    return {
+        "$toLong": {
+            "$reduce": {
+                "input": { "$setUnion": ["$Languages", []] },
+                "initialValue": 0,
+                "in": {
+                    "$let": {
+                        "vars": { "bit": { "$indexOfArray": [vocabulary, "$$this"] } },
+                        "in": {
+                            "$add": [
+                                "$$value",
+                                { "$cond": [{ "$gte": ["$$bit", 0] }, { "$pow": [2, "$$bit"] }, 0] }
+                            ]
+                        }
+                    }
+                }
+            }
+        }
+    }
+
+def union_language_masks(masks: list):
+
+    mask = 0
+    for m in masks:
+        mask |= m
+    return mask
+
+def decode_language_mask(mask: int, vocabulary: list):
+
+    return [language for bit, language in enumerate(vocabulary) if mask >> bit & 1]
+
+def count_language_mask(mask: int):
+
+    return bin(mask).count("1")
+
+def unknown_languages_expression(vocabulary: list):
+
+    #Languages of a document that have no bit in the vocabulary, they would be missing from its mask
+    return { "$size": { "$setDifference": ["$Languages", vocabulary] } }
+
+def employed_vs_unemployed_facets(data: collection.Collection, vocabulary: list):
+
+    language_mask = language_mask_expression(vocabulary)
+    unknown_languages = unknown_languages_expression(vocabulary)
 
     result = data.aggregate(
         [
@@ -398,7 +484,9 @@ def employed_vs_unemployed_gap(data: collection.Collection, data_count: int):
                             }
                         },
                         {
-                            "$unwind": "$Languages"
+                            "$addFields": {
+                                "LanguageMask": language_mask
+                            }
                         },
                         {
                         "$group": {
@@ -409,10 +497,13 @@ def employed_vs_unemployed_gap(data: collection.Collection, data_count: int):
                             "Country": "$Country"
                             },
                             "Count": {
-                            "$sum": 1
+                            "$sum": { "$size": "$Languages" }
+                            },
+                            "LanguageMasks": {
+                                "$addToSet": "$LanguageMask"
                             },
-                            "LanguageHaveWorkedWith": {
-                                "$addToSet": "$Languages"
+                            "UnknownLanguages": {
+                                "$sum": unknown_languages
                             }
                         }
                         },
@@ -423,7 +514,8 @@ def employed_vs_unemployed_gap(data: collection.Collection, data_count: int):
                             "EdLevel": "$_id.EdLevel",
                             "Country": "$_id.Country",
                             "Count": "$Count",
-                            "LanguageHaveWorkedWith": 1,
+                            "LanguageMasks": 1,
+                            "UnknownLanguages": 1,
                             "_id": 0
                         }
                         },
@@ -472,7 +564,9 @@ def employed_vs_unemployed_gap(data: collection.Collection, data_count: int):
                         }
                     },
                     {
-                        "$unwind": "$Languages"
+                        "$addFields": {
+                            "LanguageMask": language_mask
+                        }
                     },
                     {
                     "$group": {
@@ -481,10 +575,13 @@ def employed_vs_unemployed_gap(data: collection.Collection, data_count: int):
                         "Country": "$Country"
                         },
                         "Count": {
-                        "$sum": 1
+                        "$sum": { "$size": "$Languages" }
                         },
-                        "LanguageHaveWorkedWith": {
-                            "$addToSet": "$Languages"
+                        "LanguageMasks": {
+                            "$addToSet": "$LanguageMask"
+                        },
+                        "UnknownLanguages": {
+                            "$sum": unknown_languages
                         }
                     }
                     },
@@ -493,7 +590,8 @@ def employed_vs_unemployed_gap(data: collection.Collection, data_count: int):
                         "EdLevel": "$_id.EdLevel",
                         "Country": "$_id.Country",
                         "Count": "$Count",
-                        "LanguageHaveWorkedWith": 1,
+                        "LanguageMasks": 1,
+                        "UnknownLanguages": 1,
                         "_id": 0
                     }
                     },
@@ -507,22 +605,51 @@ def employed_vs_unemployed_gap(data: collection.Collection, data_count: int):
                     }
                 ]
                 }
-            },
-            # {
-            #     "$project": {
-            #         "eL": "$employedDevelopers",
-            #         "uL": "$unemployedDevelopers",
-            #         "unemployedSkillsLack": {
-            #             "$setDifference": [
-            #                 "$employedDevelopers.LanguageHaveWorkedWith",
-            #                 "$unemployedDevelopers.LanguageHaveWorkedWith"
-            #             ]
-            #         }
-            #     }
-            # }
+            }
         ]
     )
-    return result
+
+    return next(result)
+
+def count_unknown_languages(facets: dict):
+
+    return sum(developer["UnknownLanguages"] for facet in ["employedDevelopers", "unemployedDevelopers"] for developer in facets[facet])
+
+def employed_vs_unemployed_gap(data: collection.Collection, data_count: int, vocabulary: list = None):
+
+    if vocabulary is None:
+        #The cached vocabulary misses languages added since it was built, rebuild it once when that shows up
+        vocabulary = get_language_vocabulary(data)
+        facets = employed_vs_unemployed_facets(data, vocabulary)
+        if count_unknown_languages(facets):
+            vocabulary = get_language_vocabulary(data, refresh=True)
+            facets = employed_vs_unemployed_facets(data, vocabulary)
+    else:
+        facets = employed_vs_unemployed_facets(data, vocabulary)
+
+    unknown = count_unknown_languages(facets)
+    if unknown:
+        raise ValueError("%d languages of the result are not in the language vocabulary, their counts would not match the language sets" % unknown)
+
+    #Each group only carries the distinct masks of its respondents, OR them into the group's language set
+    gap = {}
+    union = {}
+    for facet in ["employedDevelopers", "unemployedDevelopers"]:
+        union[facet] = 0
+        gap[facet] = []
+        for group in facets[facet]:
+            developer = {field: value for field, value in group.items() if field not in ["LanguageMasks", "UnknownLanguages"]}
+            developer["LanguageMask"] = union_language_masks(group["LanguageMasks"])
+            developer["LanguageHaveWorkedWith"] = decode_language_mask(developer["LanguageMask"], vocabulary)
+            union[facet] |= developer["LanguageMask"]
+            gap[facet].append(developer)
+
+    #Languages the employed groups have worked with that none of the unemployed groups have
+    skills_lack = union["employedDevelopers"] & ~union["unemployedDevelopers"]
+    gap["unemployedSkillsLack"] = decode_language_mask(skills_lack, vocabulary)
+    gap["unemployedSkillsLackCount"] = count_language_mask(skills_lack)
+
+    return gap
 
 def job_title_and_common_lang_used(data: collection.Collection, data_count: int):
     result = data.aggregate([
@@ -567,10 +694,13 @@ def plot_analyze_result_1(data: collection.Collection, data_count: int):
     max_actual, max_likely = float("-inf"), float("-inf")
     min_actual, min_likely = float("inf"), float("inf")
     for doc in data:
-        max_actual = max(doc['percentage_likely_mental_health_issues'], doc['percentage_mental_health_issues'], max_actual)
-        max_likely = max(doc['percentage_likely_mental_health_issues'], doc['percentage_mental_health_issues'], max_likely)
-        min_actual = min(doc['percentage_likely_mental_health_issues'], doc['percentage_mental_health_issues'], min_actual)
-        min_likely = min(doc['percentage_likely_mental_health_issues'], doc['percentage_mental_health_issues'], min_likely)
+        # A group without respondents has null percentages, it gets no bar and does not move the limits
+        doc = dict(doc, **{key: float("nan") if doc.get(key) is None else doc[key] for key in ['percentage_mental_health_issues', 'percentage_likely_mental_health_issues']})
+        percentages = [value for value in [doc['percentage_likely_mental_health_issues'], doc['percentage_mental_health_issues']] if not math.isnan(value)]
+        max_actual = max(percentages + [max_actual])
+        max_likely = max(percentages + [max_likely])
+        min_actual = min(percentages + [min_actual])
+        min_likely = min(percentages + [min_likely])
         sdata.append(doc)
     
     # Create a list of genders and their corresponding colors
@@ -584,7 +714,9 @@ def plot_analyze_result_1(data: collection.Collection, data_count: int):
         ax[i].set_title('Mental Health Issues' if i == 0 else 'Likely Mental Health Issues')
         ax[i].set_xlabel('Ethnicity')
         ax[i].set_ylabel('Percentage')
-        ax[i].set_ylim([math.floor(min_actual), math.ceil(max_actual)] if i == 0 else [math.floor(min_likely), math.ceil(max_likely)])
+        # Without any percentage to plot the limits stay at the matplotlib default
+        if min_actual <= max_actual:
+            ax[i].set_ylim([math.floor(min_actual), math.ceil(max_actual)] if i == 0 else [math.floor(min_likely), math.ceil(max_likely)])
         ax[i].tick_params(axis='x')
         ax[i].legend(genders, loc='upper left')
         
@@ -622,58 +754,44 @@ def plot_analyze_result_2(result: collection.Collection, data_count: int):
     print(table)
     return table
 
-def plot_analyze_result_3(data: collection.Collection, count: int):
-    
-    employed_data = {"Employment": [], "OrgSize": [], "EdLevel": [], "Country": [], "LanguageHaveWorkedWith": [], "Count": []}
-    unemployed_data = {"EdLevel": [], "Country": [], "LanguageHaveWorkedWith": [], "Count": []}
+def truncate_languages(languages: list, limit: int = 5):
 
-    for i in data:
-        employedDevelopers = i['employedDevelopers']
-        unemployedDevelopers = i['unemployedDevelopers']
-        
-        for developer in employedDevelopers:
-            employed_data["Employment"].append(developer["Employment"])
-            employed_data["OrgSize"].append(developer["OrgSize"])
-            employed_data["EdLevel"].append(developer["EdLevel"])
-            employed_data["Country"].append(developer["Country"])
-            employed_data["LanguageHaveWorkedWith"].append(', '.join(developer["LanguageHaveWorkedWith"]))
-            employed_data["Count"].append(developer["Count"])
-        
-        for developer in unemployedDevelopers:
-            unemployed_data["EdLevel"].append(developer["EdLevel"])
-            unemployed_data["Country"].append(developer["Country"])
-            unemployed_data["LanguageHaveWorkedWith"].append(', '.join(developer["LanguageHaveWorkedWith"]))
-            unemployed_data["Count"].append(developer["Count"])
+    # Truncate LanguageHaveWorkedWith to limit values with wrap
+    if len(languages) > limit:
+        languages = languages[:limit]
+        languages[-1] += '...'
+    return ', '.join(languages)
+
+def plot_analyze_result_3(data: dict, count: int):
 
     employed_table = PrettyTable()
-    employed_table.field_names = list(employed_data.keys())
+    employed_table.field_names = ["Employment", "OrgSize", "EdLevel", "Country", "LanguageHaveWorkedWith", "Count"]
 
-    for row in zip(*employed_data.values()):
-        # Truncate LanguageHaveWorkedWith to 5 values with wrap
-        lhww = row[4].split(', ')
-        if len(lhww) > 5:
-            lhww = lhww[:5]
-            lhww[4] += '...'
-        row = row[:4] + (', '.join(lhww),) + row[5:]
-        employed_table.add_row(row)
+    for developer in data['employedDevelopers']:
+        employed_table.add_row([developer["Employment"],
+                    developer["OrgSize"],
+                    developer["EdLevel"],
+                    developer["Country"],
+                    truncate_languages(developer["LanguageHaveWorkedWith"]),
+                    developer["Count"]])
 
     unemployed_table = PrettyTable()
-    unemployed_table.field_names = list(unemployed_data.keys())
+    unemployed_table.field_names = ["EdLevel", "Country", "LanguageHaveWorkedWith", "Count"]
 
-    for row in zip(*unemployed_data.values()):
-        # Truncate LanguageHaveWorkedWith to 5 values with wrap
-        lhww = row[2].split(', ')
-        if len(lhww) > 5:
-            lhww = lhww[:5]
-            lhww[4] += '...'
-        row = row[:2] + (', '.join(lhww),) + row[3:]
-        unemployed_table.add_row(row)
+    for developer in data['unemployedDevelopers']:
+        unemployed_table.add_row([developer["EdLevel"],
+                    developer["Country"],
+                    truncate_languages(developer["LanguageHaveWorkedWith"]),
+                    developer["Count"]])
 
     print("Employed Developers:\n")
     print(employed_table)
 
     print("\nUnemployed Developers:\n")
     print(unemployed_table)
+
+    print("\nLanguages unemployed developers lack (%d):\n" % data['unemployedSkillsLackCount'])
+    print(', '.join(data['unemployedSkillsLack']) or "None")
     return
 
 def plot_analyze_result_4(data: collection.Collection, data_count: int):
@@ -0,0 +1,217 @@
+from math import prod
+import re
+import time
+import numpy as np
+from prettytable import PrettyTable
+from proj import get_database
+from local_analysis import load_survey_columns, build_lookups, AGE_GROUPS, ORG_SIZE_BUCKETS
+
+#Dense cube of count/sum/sum-of-squares of compensation and experience over the low-cardinality survey fields.
+#Respondents enter it once, every later slice or roll-up is a NumPy reduction instead of a collection scan.
+
+CUBE_DIMENSIONS = ["Country", "OrgSizeBucket", "AgeGroup", "RemoteWork", "Employment", "EdLevel", "MainBranch"]
+CUBE_MEASURES = ["Count", "CompCount", "CompSum", "CompSumSq", "ExpCount", "ExpSum", "ExpSumSq"]
+OTHER_LEVEL = "Other"
+
+#Dimensions that are only ever filtered on a few values keep those and fold the rest into OTHER_LEVEL,
+#every other dimension (Country in particular) keeps all of its values
+CUBE_KEPT_LEVELS = {
+    "Employment": ["Employed, full-time", "Not employed, but looking for work"],
+    "MainBranch": ["I am a developer by profession"]
+}
+
+#Roll-ups that query families read instead of the full cube, name -> (selections, kept dimensions)
+CUBE_ROLLUPS = {
+    "remote_work": (
+        {"MainBranch": ["I am a developer by profession"], "Employment": ["Employed, full-time"]},
+        ["Country", "AgeGroup", "RemoteWork"]
+    )
+}
+
+def org_size_range_bucket(org_size):
+
+    #OrgSize holds ranges such as "20 to 99 employees", bucket them by their upper bound with the 10/100/1000 thresholds
+    #of analyze_tech_stack_preference (whose $switch compares the strings with numbers and so puts all of them in "Very Large").
+    #Unlike that $switch, which leaves 1001-9999 to "Unknown", everything above 1000 is "Very Large" here so that
+    #"1,000 to 4,999" and "5,000 to 9,999 employees" get a bucket, "Unknown" is kept for "I don't know", NA and missing
+    if not isinstance(org_size, str):
+        return ORG_SIZE_BUCKETS.index("Unknown")
+    if org_size.startswith("Just me"):
+        return 0
+    bounds = [int(bound.replace(",", "")) for bound in re.findall(r"\d[\d,]*", org_size)]
+    if not bounds:
+        return ORG_SIZE_BUCKETS.index("Unknown")
+    for bucket, bound in enumerate([10, 100, 1000]):
+        if max(bounds) <= bound:
+            return bucket
+    return ORG_SIZE_BUCKETS.index("Very Large")
+
+def _dimension_levels(codes, labels: list, rows, kept: list = None):
+
+    #Every value seen among rows, or only the kept ones plus OTHER_LEVEL, -1 (missing) becomes None
+    if kept is None:
+        present = np.flatnonzero(np.bincount(codes[rows] + 1, minlength=len(labels) + 1))
+        levels = [None if code == 0 else labels[code - 1] for code in present]
+        level_of = np.zeros(len(labels) + 1, dtype=np.int64)
+        level_of[present] = np.arange(len(present))
+    else:
+        levels = list(kept) + [OTHER_LEVEL]
+        level_of = np.full(len(labels) + 1, len(kept), dtype=np.int64)
+        code_of = {label: code for code, label in enumerate(labels)}
+        for level, label in enumerate(kept):
+            if label in code_of:
+                level_of[code_of[label] + 1] = level
+    return levels, level_of[codes + 1]
+
+def build_cube(columns: dict, lookups: dict, dimensions: list = CUBE_DIMENSIONS, kept_levels: dict = CUBE_KEPT_LEVELS, require: tuple = ("ConvertedCompYearly", "YearsCodePro")):
+
+    #Only respondents that report every field in require are counted, like the $ne "NA" filters of the pipelines
+    rows = np.ones(len(columns["Country"]), dtype=bool)
+    for field in require:
+        rows &= columns[field + "Present"]
+
+    levels, indices = {}, []
+    for dimension in dimensions:
+        if dimension == "AgeGroup":
+            levels[dimension] = list(AGE_GROUPS)
+            indices.append(lookups["age_group"][columns["Age"]])
+        elif dimension == "OrgSizeBucket":
+            levels[dimension] = list(ORG_SIZE_BUCKETS)
+            bucket_of = np.array([org_size_range_bucket(value) for value in lookups["vocab"]["OrgSize"]] + [org_size_range_bucket(None)], dtype=np.int64)
+            indices.append(bucket_of[columns["OrgSize"]])
+        else:
+            levels[dimension], index = _dimension_levels(columns[dimension], lookups["vocab"][dimension], rows, kept_levels.get(dimension))
+            indices.append(index)
+
+    shape = tuple(len(levels[dimension]) for dimension in dimensions)
+    cells = np.ravel_multi_index([index[rows] for index in indices], shape)
+
+    measures = []
+    for field in ["ConvertedCompYearly", "YearsCodePro"]:
+        value = columns[field][rows]
+        valid = ~np.isnan(value)
+        value = np.where(valid, value, 0.0)
+        measures += [valid, value, value * value]
+    data = np.stack(
+        [np.bincount(cells, minlength=prod(shape))] + [np.bincount(cells, weights=measure, minlength=prod(shape)) for measure in measures],
+        axis=-1
+    ).astype(np.float64)
+
+    cube = {
+        "dimensions": list(dimensions),
+        "levels": levels,
+        "measures": list(CUBE_MEASURES),
+        "data": data.reshape(shape + (len(CUBE_MEASURES),)),
+        "rollups": {}
+    }
+    for name in CUBE_ROLLUPS:
+        if set(CUBE_ROLLUPS[name][1]) | set(CUBE_ROLLUPS[name][0]) <= set(dimensions):
+            get_rollup(cube, name)
+    return cube
+
+def get_rollup(cube: dict, name: str):
+
+    #Precomputed roll-ups are small enough that slicing them costs microseconds, the full cube is only read once
+    if name not in cube.setdefault("rollups", {}):
+        selections, dimensions = CUBE_ROLLUPS[name]
+        cube["rollups"][name] = roll_up(slice_cube(cube, selections), dimensions)
+    return cube["rollups"][name]
+
+def slice_cube(cube: dict, selections: dict):
+
+    #selections maps a dimension to the levels to keep, the dimension itself stays in the cube
+    data, levels = cube["data"], dict(cube["levels"])
+    for dimension, selected in selections.items():
+        axis = cube["dimensions"].index(dimension)
+        if len(set(selected)) != len(selected):
+            raise ValueError("Selection of %s repeats a level, it would be counted twice: %r" % (dimension, selected))
+        positions = []
+        for level in selected:
+            if level not in levels[dimension]:
+                raise ValueError("%r is not a level of %s, it may have been folded into %r" % (level, dimension, OTHER_LEVEL))
+            positions.append(levels[dimension].index(level))
+        if positions and positions == list(range(positions[0], positions[0] + len(positions))):
+            #A run of neighbouring levels is basic indexing, a view instead of a copy
+            data = data[(slice(None),) * axis + (slice(positions[0], positions[0] + len(positions)),)]
+        else:
+            data = np.take(data, positions, axis=axis)
+        levels[dimension] = list(selected)
+
+    return {"dimensions": list(cube["dimensions"]), "levels": levels, "measures": list(cube["measures"]), "data": data}
+
+def roll_up(cube: dict, dimensions: list):
+
+    #Sum the measures over every dimension that is not kept
+    axes = tuple(axis for axis, dimension in enumerate(cube["dimensions"]) if dimension not in dimensions)
+    kept = [dimension for dimension in cube["dimensions"] if dimension in dimensions]
+    return {
+        "dimensions": kept,
+        "levels": {dimension: cube["levels"][dimension] for dimension in kept},
+        "measures": list(cube["measures"]),
+        "data": cube["data"].sum(axis=axes)
+    }
+
+def cube_statistics(cube: dict):
+
+    #Per cell averages and population standard deviations, nan where a cell has no values
+    data = cube["data"]
+    measure = {name: data[..., i] for i, name in enumerate(cube["measures"])}
+    statistics = {"Count": measure["Count"]}
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for prefix, name in [("Comp", "Compensation"), ("Exp", "YearsExp")]:
+            n = measure[prefix + "Count"]
+            mean = np.where(n > 0, measure[prefix + "Sum"] / n, np.nan)
+            statistics["Avg" + name] = mean
+            statistics["Std" + name] = np.sqrt(np.clip(measure[prefix + "SumSq"] / n - mean * mean, 0, None))
+    return statistics
+
+def remote_work_impact_from_cube(cube: dict, countries: list = None):
+
+    #Same rows as analyze_remote_work_impact, optionally restricted to a subset of countries
+    rollup = get_rollup(cube, "remote_work")
+    selections = {
+        "RemoteWork": [level for level in ["Fully remote", "Hybrid (some remote, some in-person)"] if level in rollup["levels"]["RemoteWork"]]
+    }
+    if countries is not None:
+        selections["Country"] = countries
+    result = roll_up(slice_cube(rollup, selections), ["AgeGroup", "RemoteWork"])
+    statistics = cube_statistics(result)
+
+    docs = []
+    for i, age in enumerate(result["levels"]["AgeGroup"]):
+        for j, remote_work in enumerate(result["levels"]["RemoteWork"]):
+            if not statistics["Count"][i, j]:
+                continue
+            avg_compensation, avg_years_exp = statistics["AvgCompensation"][i, j], statistics["AvgYearsExp"][i, j]
+            docs.append({
+                "AvgCompensation": None if np.isnan(avg_compensation) else float(avg_compensation),
+                "AvgYearsExp": None if np.isnan(avg_years_exp) else float(avg_years_exp),
+                "Count": int(statistics["Count"][i, j]),
+                "Age": age,
+                "RemoteWork": remote_work
+            })
+    docs.sort(key=lambda doc: (doc["Age"], doc["RemoteWork"]))
+    return docs
+
+if __name__ == "__main__":
+
+    #Get the collection
+    stack_data = get_database()["surveyresult"]
+
+    columns, vocab = load_survey_columns(stack_data)
+
+    start = time.perf_counter()
+    cube = build_cube(columns, build_lookups(vocab))
+    print("Cube => ", cube["data"].shape, round(cube["data"].nbytes / 2 ** 20, 1), "MB in", round(time.perf_counter() - start, 3), "s\n")
+
+    countries = [level for level in cube["levels"]["Country"] if level not in [None, "NA"]][:3]
+    start = time.perf_counter()
+    result = remote_work_impact_from_cube(cube, countries)
+    elapsed = time.perf_counter() - start
+
+    table = PrettyTable()
+    table.field_names = ["Age", "RemoteWork", "Count", "AvgCompensation", "AvgYearsExp"]
+    for doc in result:
+        table.add_row([doc["Age"], doc["RemoteWork"], doc["Count"], doc["AvgCompensation"], doc["AvgYearsExp"]])
+    print("Remote work impact in", ", ".join(countries), "answered in", round(elapsed * 1e6), "us\n")
+    print(table)